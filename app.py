@@ -1,12 +1,17 @@
 import os
 import json
 import uuid
+import logging
+import threading
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+# Configure logging once for the whole application
+logging.basicConfig(level=logging.INFO)
+
 
 class Base(DeclarativeBase):
     pass
@@ -44,10 +49,20 @@ from services.openai_service import (
     process_query_default,
     process_query_with_web_search,
     process_query_with_computer_use,
-    process_query_with_file_search
+    process_query_with_file_search,
+    warmup as warmup_openai
 )
 from services.browser_service import process_autonomous_navigation
-from services.speech_service import text_to_speech
+from services.speech_service import (
+    text_to_speech,
+    submit_text_to_speech,
+    pick_speech_backend,
+    concat_audio_files,
+    create_speech_ticket,
+    get_speech_ticket,
+    iter_text_to_speech,
+    warmup as warmup_speech
+)
 from services.tools_service import (
     upload_file_to_vector_store,
     get_available_files,
@@ -63,6 +78,78 @@ with app.app_context():
     db.create_all()
 
 
+def warmup_connections():
+    """Pre-warm the OpenAI and TTS connections so the first user request skips the TLS handshakes"""
+    warmup_openai()
+    warmup_speech()
+
+
+# Run in the background so startup is not delayed by the network
+threading.Thread(target=warmup_connections, name="warmup", daemon=True).start()
+
+
+def process_default_with_speech(client, input_data, is_text=False):
+    """
+    Process a query with the default agent, synthesizing speech sentence by sentence
+    while the response is still being generated
+    Returns (transcript, response, audio_url)
+    """
+    segments = []
+    language = {}
+    # One backend for the whole reply, so the voice does not change between sentences
+    backend = pick_speech_backend()
+    
+    def on_sentence(sentence):
+        # Detect the language once, from the first sentence
+        if 'code' not in language:
+            language['code'] = detect_language(client, sentence)
+        segments.append(submit_text_to_speech(sentence, language=language['code'], prefer=backend))
+    
+    transcript, response = process_query_default(client, input_data, is_text=is_text, on_sentence=on_sentence)
+    
+    audio_path = concat_audio_files([segment.result() for segment in segments])
+    if not audio_path:
+        audio_path = text_to_speech(response, language=detect_language(client, response), prefer=backend)
+    
+    return transcript, response, f'/audio/{os.path.basename(audio_path)}'
+
+
+def finalize_response(client, transcript, response):
+    """
+    Prepare the voice response for a finished text response
+    Speech is synthesized and streamed when the client requests the returned URL
+    Returns (transcript, response, audio_url)
+    """
+    # Detect language for better TTS
+    detected_lang = detect_language(client, response)
+    
+    ticket = create_speech_ticket(response, language=detected_lang)
+    
+    return transcript, response, f'/audio/{ticket}'
+
+
+def process_query(client, agent_type, input_data, is_text=False):
+    """
+    Dispatch a query (text or audio path) to the handler for the given agent type
+    Returns (transcript, response, audio_url)
+    """
+    if agent_type == AgentType.WEB_SEARCH:
+        transcript, response = process_query_with_web_search(client, input_data, is_text=is_text)
+    elif agent_type == AgentType.COMPUTER_USE:
+        transcript, response = process_query_with_computer_use(client, input_data, is_text=is_text)
+    elif agent_type == AgentType.FILE_SEARCH:
+        # Get vector store ID if available
+        vector_store_id = get_stored_vector_store_id()
+        transcript, response = process_query_with_file_search(
+            client, input_data, is_text=is_text, vector_store_id=vector_store_id
+        )
+    else:
+        # Default processing (speech is generated while the response streams)
+        return process_default_with_speech(client, input_data, is_text=is_text)
+    
+    return finalize_response(client, transcript, response)
+
+
 @app.route('/')
 def index():
     """Render the main page"""
@@ -78,7 +165,15 @@ def get_agents():
 
 @app.route('/audio/<path:filename>')
 def serve_audio(filename):
-    """Serve generated audio files"""
+    """Serve generated audio files, or stream synthesis for a pending speech ticket"""
+    speech_request = get_speech_ticket(filename)
+    if speech_request:
+        text, language, voice = speech_request
+        return Response(
+            stream_with_context(iter_text_to_speech(text, language=language, voice=voice)),
+            mimetype='audio/mpeg'
+        )
+    
     return send_from_directory(AUDIO_FOLDER, filename)
 
 
@@ -100,34 +195,12 @@ def process_speech():
         
         # Process based on agent type without transcription
         try:
-            if agent_type == AgentType.WEB_SEARCH:
-                # Process with web search (creating a dummy transcript since we already have text)
-                _, response = process_query_with_web_search(client, text_query, is_text=True)
-            elif agent_type == AgentType.COMPUTER_USE:
-                # Process with computer use
-                _, response = process_query_with_computer_use(client, text_query, is_text=True)
-            elif agent_type == AgentType.FILE_SEARCH:
-                # Get vector store ID if available
-                vector_store_id = get_stored_vector_store_id()
-                # Process with file search
-                _, response = process_query_with_file_search(client, text_query, vector_store_id, is_text=True)
-            else:
-                # Default processing
-                _, response = process_query_default(client, text_query, is_text=True)
-            
-            # Detect language for better TTS
-            detected_lang = detect_language(client, response)
-            
-            # Generate speech with appropriate language
-            audio_path = text_to_speech(response, language=detected_lang)
-            
-            # Extract just the filename from the path
-            audio_filename = os.path.basename(audio_path)
+            _, response, audio_url = process_query(client, agent_type, text_query, is_text=True)
             
             return jsonify({
                 'transcript': text_query,  # Just use the original text
                 'response': response,
-                'audio_url': f'/audio/{audio_filename}'
+                'audio_url': audio_url
             })
         
         except Exception as e:
@@ -152,34 +225,12 @@ def process_speech():
         
         # Process based on agent type
         try:
-            if agent_type == AgentType.WEB_SEARCH:
-                # Process with web search
-                transcript, response = process_query_with_web_search(client, audio_path)
-            elif agent_type == AgentType.COMPUTER_USE:
-                # Process with computer use
-                transcript, response = process_query_with_computer_use(client, audio_path)
-            elif agent_type == AgentType.FILE_SEARCH:
-                # Get vector store ID if available
-                vector_store_id = get_stored_vector_store_id()
-                # Process with file search
-                transcript, response = process_query_with_file_search(client, audio_path, vector_store_id)
-            else:
-                # Default processing
-                transcript, response = process_query_default(client, audio_path)
-            
-            # Detect language for better TTS
-            detected_lang = detect_language(client, response)
-            
-            # Generate speech with appropriate language
-            audio_path = text_to_speech(response, language=detected_lang)
-            
-            # Extract just the filename from the path
-            audio_filename = os.path.basename(audio_path)
+            transcript, response, audio_url = process_query(client, agent_type, audio_path)
             
             return jsonify({
                 'transcript': transcript,
                 'response': response,
-                'audio_url': f'/audio/{audio_filename}'
+                'audio_url': audio_url
             })
         
         except Exception as e:
@@ -16,5 +16,6 @@
     pkgs.gitFull
     pkgs.postgresql
     pkgs.openssl
+    pkgs.ffmpeg
   ];
 }
@@ -14,6 +14,10 @@ from io import BytesIO
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Screenshot folder (served by /screenshots), created once at import
+SCREENSHOTS_FOLDER = os.path.join(os.getcwd(), "tmp")
+os.makedirs(SCREENSHOTS_FOLDER, exist_ok=True)
+
 # Try to import the necessary browser automation libraries
 try:
     from playwright.sync_api import sync_playwright
@@ -54,9 +58,7 @@ class MockBrowser:
             draw.text((130, 35), self.current_url, fill=(0, 0, 0))
 
             # Save screenshot
-            static_temp_dir = os.path.join(os.getcwd(), "tmp")
-            os.makedirs(static_temp_dir, exist_ok=True)
-            screenshot_file = os.path.join(static_temp_dir, f"screenshot_{int(time.time())}.png")
+            screenshot_file = os.path.join(SCREENSHOTS_FOLDER, f"screenshot_{int(time.time())}.png")
             img.save(screenshot_file)
             self.screenshot_path = screenshot_file
 
@@ -148,10 +150,7 @@ class VirtualBrowser:
             return None
 
         try:
-            # Create screenshot directory
-            static_temp_dir = os.path.join(os.getcwd(), "tmp")
-            os.makedirs(static_temp_dir, exist_ok=True)
-            screenshot_file = os.path.join(static_temp_dir, f"screenshot_{int(time.time())}.png")
+            screenshot_file = os.path.join(SCREENSHOTS_FOLDER, f"screenshot_{int(time.time())}.png")
 
             # Take screenshot
             self.page.screenshot(path=screenshot_file)
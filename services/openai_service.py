@@ -7,6 +7,9 @@ import speech_recognition as sr
 from openai import OpenAI
 import json
 import logging
+import string
+import threading
+from collections import OrderedDict
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,13 +18,64 @@ logger = logging.getLogger(__name__)
 # OpenAI API key
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+# Models used for routing: the lightweight one handles short/simple turns
+DEFAULT_MODEL = "gpt-4o"  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024
+LIGHT_MODEL = "gpt-4o-mini"
+# Greeting words matched against the whole first word, so "historia" or "higiene" do not count
+SIMPLE_QUERY_WORDS = frozenset({"hola", "hi", "hello", "gracias"})
+# Punctuation stripped from the first word before matching (including Spanish ¡ and ¿)
+_WORD_PUNCTUATION = string.punctuation + "¡¿"
+SIMPLE_QUERY_MAX_WORDS = 12
+
+# Sentence boundaries used to flush streamed text to TTS early
+SENTENCE_ENDINGS = ('.', '?', '!')
+MIN_SENTENCE_CHARS = 20
+
+# Detected languages memoized by normalized text prefix (repeated greetings, thanks, etc.)
+LANGUAGE_SAMPLE_CHARS = 100
+LANGUAGE_CACHE_SIZE = 2048
+_LANGUAGE_CACHE = OrderedDict()
+_LANGUAGE_CACHE_LOCK = threading.Lock()
+
+
+_OPENAI_CLIENT = None
+_OPENAI_CLIENT_LOCK = threading.Lock()
+
+# Timeout for the startup connection warm-up request
+WARMUP_TIMEOUT = 5
+
 
 def create_openai_client():
-    """Create and return an OpenAI client"""
+    """
+    Return the shared OpenAI client (created on first use)
+    The client is thread-safe and reusing it keeps its connection pool warm between requests
+    """
+    global _OPENAI_CLIENT
     if not OPENAI_API_KEY:
         raise ValueError("OpenAI API key is not set. Please set the OPENAI_API_KEY environment variable.")
     
-    return OpenAI(api_key=OPENAI_API_KEY)
+    with _OPENAI_CLIENT_LOCK:
+        if _OPENAI_CLIENT is None:
+            _OPENAI_CLIENT = OpenAI(api_key=OPENAI_API_KEY)
+    return _OPENAI_CLIENT
+
+
+def warmup():
+    """Open the TLS connection to the OpenAI API ahead of the first user request"""
+    try:
+        create_openai_client().with_options(timeout=WARMUP_TIMEOUT, max_retries=0).models.list()
+    except Exception as e:
+        logger.warning(f"OpenAI connection warm-up failed: {e}")
+
+
+def pick_model(transcript):
+    """Pick the cheapest model suited to the query (short or greeting-like -> mini)"""
+    if len(transcript.split()) < SIMPLE_QUERY_MAX_WORDS:
+        return LIGHT_MODEL
+    first_word = transcript.lower().split(maxsplit=1)[:1]
+    if first_word and first_word[0].strip(_WORD_PUNCTUATION) in SIMPLE_QUERY_WORDS:
+        return LIGHT_MODEL
+    return DEFAULT_MODEL
 
 
 def transcribe_audio(client, audio_path):
@@ -32,46 +86,122 @@ def transcribe_audio(client, audio_path):
                 model="whisper-1",
                 file=audio_file,
             )
+            # The recording is not read again, so keep it out of the page cache
+            if hasattr(os, "posix_fadvise"):
+                try:
+                    os.posix_fadvise(audio_file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                except OSError:
+                    pass  # Only a hint; never fail a finished transcription over it
         return transcription.text
     except Exception as e:
         logger.error(f"Error transcribing audio: {e}")
         raise Exception(f"Failed to transcribe audio: {e}")
 
 
+def _detect_language_remote(client, text_sample):
+    """Ask the model for the ISO 639-1 code of the text sample"""
+    response = client.chat.completions.create(
+        model=LIGHT_MODEL,  # Short classification prompt, the light model is enough
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a language detection expert. Identify the language of the text and respond with only the ISO 639-1 language code (e.g., 'en' for English, 'es' for Spanish, etc.)"
+            },
+            {
+                "role": "user",
+                "content": text_sample
+            }
+        ],
+        max_tokens=10,
+        temperature=0.3,
+    )
+    
+    # Extract language code from the response
+    language_code = response.choices[0].message.content.strip().lower()
+    
+    # Validate the language code (basic check)
+    if len(language_code) > 5:  # If the response is longer than expected
+        return "en"  # Default to English
+    
+    return language_code
+
+
 def detect_language(client, text_sample):
     """Detect language from text sample"""
+    if not isinstance(text_sample, str) or not text_sample.strip():
+        return "en"  # Nothing to detect (e.g. a reply without text content); not cached
+    
+    sample = text_sample[:LANGUAGE_SAMPLE_CHARS]  # Use just the first 100 chars for efficiency
+    cache_key = sample.lower().strip()
+    
+    with _LANGUAGE_CACHE_LOCK:
+        language_code = _LANGUAGE_CACHE.get(cache_key)
+        if language_code:
+            _LANGUAGE_CACHE.move_to_end(cache_key)
+            return language_code
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a language detection expert. Identify the language of the text and respond with only the ISO 639-1 language code (e.g., 'en' for English, 'es' for Spanish, etc.)"
-                },
-                {
-                    "role": "user",
-                    "content": text_sample[:100]  # Use just the first 100 chars for efficiency
-                }
-            ],
-            max_tokens=10,
-            temperature=0.3,
-        )
-        
-        # Extract language code from the response
-        language_code = response.choices[0].message.content.strip().lower()
-        
-        # Validate the language code (basic check)
-        if len(language_code) > 5:  # If the response is longer than expected
-            return "en"  # Default to English
-        
-        return language_code
+        language_code = _detect_language_remote(client, sample)
     except Exception as e:
         logger.error(f"Error detecting language: {e}")
-        return "en"  # Default to English on failure
+        return "en"  # Default to English on failure (not cached)
+    
+    with _LANGUAGE_CACHE_LOCK:
+        _LANGUAGE_CACHE[cache_key] = language_code
+        if len(_LANGUAGE_CACHE) > LANGUAGE_CACHE_SIZE:
+            _LANGUAGE_CACHE.popitem(last=False)
+    
+    return language_code
 
 
-def process_query_default(client, input_data, is_text=False):
-    """Process a query using standard conversation capabilities"""
+def _last_sentence_end(text):
+    """
+    Index just past the last sentence ending that is followed by whitespace, or 0
+    A trailing ending is not a boundary yet: it may be a decimal point or a thousands
+    separator ("3.5", "1.500") whose digits arrive with the next token
+    """
+    for i in range(len(text) - 2, -1, -1):
+        if text[i] in SENTENCE_ENDINGS and text[i + 1].isspace():
+            return i + 1
+    return 0
+
+
+def _stream_sentences(response, on_sentence):
+    """
+    Consume a streamed chat completion, calling on_sentence for every complete sentence
+    Returns the full response text
+    """
+    full_text = ""
+    buffer = ""
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        full_text += delta
+        buffer += delta
+        
+        # Flush everything up to the last sentence boundary once we have enough text
+        if len(buffer) >= MIN_SENTENCE_CHARS:
+            cut = _last_sentence_end(buffer)
+            if cut >= MIN_SENTENCE_CHARS:
+                on_sentence(buffer[:cut].strip())
+                buffer = buffer[cut:]
+    
+    # Flush the tail (last sentence without final punctuation)
+    if buffer.strip():
+        on_sentence(buffer.strip())
+    
+    return full_text
+
+
+def process_query_default(client, input_data, is_text=False, on_sentence=None):
+    """
+    Process a query using standard conversation capabilities
+    If on_sentence is given, the response is streamed and each sentence is passed to it
+    as soon as it is generated (e.g. to start TTS before the full answer is ready)
+    """
     try:
         # Handle text input
         if is_text:
@@ -80,9 +210,9 @@ def process_query_default(client, input_data, is_text=False):
             # Transcribe audio to text
             transcript = transcribe_audio(client, input_data)
         
-        # Process with GPT-4o
+        # Process with GPT-4o (or GPT-4o-mini for simple queries)
         response = client.chat.completions.create(
-            model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024
+            model=pick_model(transcript),
             messages=[
                 {
                     "role": "system",
@@ -98,8 +228,15 @@ def process_query_default(client, input_data, is_text=False):
             ],
             temperature=0.7,
             max_tokens=800,
+            stream=on_sentence is not None,
         )
         
+        if on_sentence is not None:
+            response_text = _stream_sentences(response, on_sentence)
+            if not response_text:
+                return transcript, "Lo siento, no pude generar una respuesta. Por favor intenta reformular tu pregunta."
+            return transcript, response_text
+        
         # Handle empty response or null content
         if not response or not response.choices or not response.choices[0].message.content:
             return transcript, "Lo siento, no pude generar una respuesta. Por favor intenta reformular tu pregunta."
@@ -348,7 +485,7 @@ def process_query_with_computer_use(client, input_data, is_text=False):
         return transcript, f"Lo siento, hubo un problema al procesar tu consulta sobre uso de computadora: {str(e)}"
 
 
-def process_query_with_file_search(client, input_data, vector_store_id=None, is_text=False):
+def process_query_with_file_search(client, input_data, is_text=False, vector_store_id=None):
     """Process a query using file search capabilities"""
     try:
         # Handle text input
@@ -2,18 +2,25 @@
 Service functions for text-to-speech conversion
 """
 import os
-import uuid
+import re
+import json
+import time
+import atexit
+import secrets
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import base64
+import binascii
+import shutil
+import threading
+import functools
+import hashlib
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from gtts import gTTS
-
-# Google Cloud TTS client
-try:
-    from google.cloud import texttospeech
-    GOOGLE_TTS_AVAILABLE = True
-except ImportError:
-    GOOGLE_TTS_AVAILABLE = False
+from gtts.tts import gTTSError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,98 +35,344 @@ if os.path.exists(GOOGLE_CREDENTIALS_FILE):
 # Google Cloud API Key - Using this as fallback
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
 
+# Shared HTTP session so the TLS connection to the Google TTS API is kept alive between calls
+GOOGLE_TTS_TIMEOUT = (3.05, 30)  # (connect, read) seconds
+GOOGLE_TTS_POOL_SIZE = 16
+_TTS_SESSION = requests.Session()
+atexit.register(_TTS_SESSION.close)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_PAYLOAD_TEXT_PLACEHOLDER = b"__TEXT__"
+_AUDIO_CONTENT_KEY = b'"audioContent"'
+
+# Simple language codes -> Google language-region codes, and region prefix -> default voice
+_LANG_TO_REGION = {
+    'en': 'en-US',
+    'es': 'es-ES',
+    'fr': 'fr-FR',
+    'de': 'de-DE',
+    'it': 'it-IT',
+    'ja': 'ja-JP',
+    'ko': 'ko-KR',
+    'pt': 'pt-BR',
+    'ru': 'ru-RU',
+    'zh': 'cmn-CN',
+}
+_REGION_TO_VOICE = {region.split('-')[0]: f"{region}-Neural2-F" for region in _LANG_TO_REGION.values()}
+DEFAULT_VOICE = 'en-US-Neural2-F'
+
+# Longest text sent to the Google TTS API and client, in UTF-8 bytes (Google rejects input
+# over 5000 bytes); gTTS splits long text itself, so it has no limit
+MAX_GOOGLE_TTS_BYTES = 4800
+
+# Google Cloud TTS library, imported on first use (it pulls in grpc and protobuf)
+texttospeech = None
+_GOOGLE_TTS_AVAILABLE = None  # Unknown until the first import attempt
+_GCLOUD_AUDIO_CONFIG = None
+
+# Google Cloud TTS client, created on first use and shared (its gRPC channel is reused)
+_GCLOUD_TTS_CLIENT = None
+_GCLOUD_TTS_CLIENT_LOCK = threading.Lock()
+# Per-thread protobuf messages reused across synthesis calls
+_GCLOUD_THREAD_STATE = threading.local()
+
+# Circuit breaker for the Google backends: after repeated failures skip them for a while
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 30
+_CIRCUIT_STATE = {
+    "google_cloud": {"fails": 0, "open_until": 0},
+    "google_rest": {"fails": 0, "open_until": 0},
+}
+_CIRCUIT_LOCK = threading.Lock()
+
 # Audio folder path
 AUDIO_FOLDER = os.path.join('uploads', 'audio')
+os.makedirs(AUDIO_FOLDER, exist_ok=True)
+
+# Static audio returned when every TTS method fails (created at import, retried in the background)
+_ERROR_PATH = os.path.join(AUDIO_FOLDER, "error_message.mp3")
+ERROR_MESSAGE_TEXT = "Lo siento, hubo un problema con la síntesis de voz."
+ERROR_AUDIO_RETRY_SECONDS = 60
+_error_audio_retry_at = 0
+_error_audio_retry_lock = threading.Lock()
+
+# Pre-rendered tone shipped with the app, served until the spoken error message exists
+_ERROR_FALLBACK_SOURCE = os.path.join('static', 'audio', 'error_tone.mp3')
+_ERROR_FALLBACK_PATH = os.path.join(AUDIO_FOLDER, "error_tone.mp3")
+
+# Background workers for sentence-by-sentence synthesis
+TTS_MAX_WORKERS = 4
+_TTS_EXECUTOR = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+
+# Workers for the concurrent (hedged) backend attempts inside text_to_speech.
+# Each backend has its own pool, so calls hanging on one never queue the other's work;
+# Google Cloud calls are also capped in flight and skipped while every slot is busy
+HEDGE_TIMEOUT = 10  # seconds
+GCLOUD_TTS_TIMEOUT = 8  # seconds, below HEDGE_TIMEOUT so a hung call ends before the hedge gives up
+GTTS_TIMEOUT = (3.05, 8)  # (connect, read) seconds per gTTS request, also below HEDGE_TIMEOUT
+_GTTS_EXECUTOR = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts-gtts")
+_GCLOUD_EXECUTOR = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts-gcloud")
+_GCLOUD_IN_FLIGHT = threading.BoundedSemaphore(TTS_MAX_WORKERS)
+
+# Concurrent syntheses (TTS workers and request threads) share the session's warm connections.
+# Connection errors and error statuses are retried (synthesize is idempotent, so POST is safe);
+# read timeouts are not, so one call never waits more than a single read timeout
+_TTS_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=GOOGLE_TTS_POOL_SIZE,
+    max_retries=Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"HEAD", "GET", "POST"}),
+        raise_on_status=False,
+    ),
+))
+
+# Chunk size used when decoding audio, and buffer size of audio files written to disk
+# (few large write() calls instead of many 8 KiB ones)
+AUDIO_WRITE_CHUNK_SIZE = 64 * 1024
+AUDIO_FILE_BUFFER_SIZE = 1024 * 1024
+
+# Pending speech requests, synthesized on demand when the client fetches the audio
+SPEECH_TICKET_TTL = 300  # seconds
+AUDIO_STREAM_CHUNK_SIZE = 8192
+_SPEECH_TICKETS = {}
+_SPEECH_TICKETS_LOCK = threading.Lock()
+
+
+class PooledGTTS(gTTS):
+    """
+    gTTS variant that sends its requests through one shared requests.Session
+    Upstream gTTS opens (and tears down) a new session for every request; this keeps
+    the TLS connection to translate.google.com alive between calls.
+    stream() mirrors gtts.tts.gTTS.stream (gTTS 2.5) - review it when upgrading gTTS.
+    If upstream drops the internals it relies on, it falls back to the stock gTTS.stream
+    (one session per request) instead of failing.
+    """
+    _SESSION = requests.Session()
+    _SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+    atexit.register(_SESSION.close)
+    
+    def __init__(self, *args, timeout=GTTS_TIMEOUT, **kwargs):
+        # Upstream waits forever by default, which would pin a worker thread on a hung request
+        super().__init__(*args, timeout=timeout, **kwargs)
+    
+    def stream(self):
+        """Do the TTS API request(s) over the shared session and stream bytes"""
+        if not hasattr(self, "_prepare_requests"):
+            yield from super().stream()
+            return
+        
+        for pr in self._prepare_requests():
+            try:
+                r = self._SESSION.send(
+                    request=pr,
+                    verify=False,  # Same as upstream gTTS (proxies and firewalls)
+                    proxies=urllib.request.getproxies(),
+                    timeout=self.timeout,
+                )
+                r.raise_for_status()
+            except requests.exceptions.HTTPError:
+                raise gTTSError(tts=self, response=r)
+            except requests.exceptions.RequestException:
+                raise gTTSError(tts=self)
+            
+            for line in r.iter_lines(chunk_size=1024):
+                decoded_line = line.decode("utf-8")
+                if "jQ1olc" in decoded_line:
+                    audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                    if not audio_search:
+                        raise gTTSError(tts=self, response=r)
+                    yield base64.b64decode(audio_search.group(1).encode("ascii"))
+
+
+# Silence the warning urllib3 emits for every unverified request (gTTS does the same)
+requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+
+
+def warmup():
+    """Open the TLS connections to the TTS endpoints ahead of the first user request"""
+    endpoints = [(PooledGTTS._SESSION, "https://translate.google.com/")]
+    if GOOGLE_API_KEY:
+        endpoints.append((_TTS_SESSION, "https://texttospeech.googleapis.com/"))
+    
+    for session, url in endpoints:
+        try:
+            session.head(url, timeout=5)
+        except Exception as e:
+            logger.warning(f"TTS connection warm-up failed for {url}: {e}")
+    
+    # The Google Cloud client multiplexes every synthesis over one HTTP/2 (gRPC) channel;
+    # a cheap RPC creates the shared client and connects that channel up front
+    if _gcloud_configured():
+        try:
+            _get_gcloud_client().list_voices(language_code="en-US", timeout=5)
+        except Exception as e:
+            logger.warning(f"Google Cloud TTS channel warm-up failed: {e}")
+
+
+def _new_audio_filename(prefix=''):
+    """Build a unique mp3 filename (millisecond timestamp + short random suffix)"""
+    return f"{prefix}{int(time.time() * 1000):x}_{secrets.token_hex(4)}.mp3"
+
+
+def _is_speakable(text):
+    """Check stripped text before synthesis: it must be non-empty"""
+    if not text:
+        logger.error("Empty text provided for speech conversion")
+        return False
+    return True
+
+
+def _fits_google_tts(text):
+    """Return True if text is within the Google TTS input limit (measured in UTF-8 bytes)"""
+    return len(text.encode('utf-8')) <= MAX_GOOGLE_TTS_BYTES
+
+
+def _default_voice(language):
+    """Default Neural2 voice for a language code"""
+    region = _LANG_TO_REGION.get(language, language)
+    return _REGION_TO_VOICE.get(region.split('-')[0], DEFAULT_VOICE)
+
+
+def _tts_filename(text, language, voice):
+    """Content-addressed mp3 filename for (text, language, voice)"""
+    return hashlib.sha1(f"{language}|{voice or ''}|{text}".encode('utf-8')).hexdigest()[:24] + ".mp3"
+
+
+def _cached_audio_path(text, language, voice):
+    """Deterministic path of the synthesized audio for (text, language, voice)"""
+    return os.path.join(AUDIO_FOLDER, _tts_filename(text, language, voice))
+
+
+def _save_gtts(text, lang, file_path, **kwargs):
+    """Synthesize text with gTTS into file_path; the file only appears once complete"""
+    # gTTS creates the file before downloading, so write elsewhere and move it into place
+    tmp_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+    try:
+        with open(tmp_path, "wb", buffering=AUDIO_FILE_BUFFER_SIZE) as out:
+            PooledGTTS(text=text, lang=lang, **kwargs).write_to_fp(out)
+        os.replace(tmp_path, file_path)
+    finally:
+        _discard_file(tmp_path)
+
+
+def _store_cached_audio(tts_file_path, tmp_path, cached_path):
+    """
+    Move a fresh synthesis from tmp_path into the cache and return the path to use
+    Anything else (e.g. an error message written elsewhere) is returned as is and not cached
+    """
+    if tts_file_path == tmp_path:
+        os.replace(tmp_path, cached_path)
+        return cached_path
+    
+    # Drop any partial output left by a failed backend
+    _discard_file(tmp_path)
+    return tts_file_path
+
+
+def _discard_file(file_path):
+    """Remove a file if it exists, ignoring errors"""
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def _circuit_is_open(backend):
+    """Return True if the backend failed repeatedly and should be skipped for now"""
+    return time.time() < _CIRCUIT_STATE[backend]["open_until"]
+
 
+def _record_backend_result(backend, success):
+    """Update the circuit breaker state of a backend after a synthesis attempt"""
+    state = _CIRCUIT_STATE[backend]
+    with _CIRCUIT_LOCK:
+        if success:
+            state["fails"] = 0
+            return
+        state["fails"] += 1
+        fails = state["fails"]
+        if fails >= CIRCUIT_FAILURE_THRESHOLD:
+            state["open_until"] = time.time() + CIRCUIT_OPEN_SECONDS
+    if fails >= CIRCUIT_FAILURE_THRESHOLD:
+        logger.warning(f"TTS backend {backend} failed {fails} times, skipping it for {CIRCUIT_OPEN_SECONDS}s")
 
-def get_google_tts_enhanced(text, language='en', voice='en-US-Neural2-F', speed=1.0):
+
+def _write_base64_audio(audio_content, file_path, chunk_size=AUDIO_WRITE_CHUNK_SIZE):
+    """
+    Decode base64 audio content into file_path chunk by chunk
+    Only one chunk of decoded audio is held in memory at a time
+    """
+    # Each 4 base64 characters decode to 3 bytes, so chunks must stay aligned to 4
+    chunk_size -= chunk_size % 4
+    with open(file_path, "wb", buffering=AUDIO_FILE_BUFFER_SIZE) as audio_file:
+        for start in range(0, len(audio_content), chunk_size):
+            audio_file.write(binascii.a2b_base64(audio_content[start:start + chunk_size]))
+
+
+@functools.lru_cache(maxsize=64)
+def _google_tts_payload_template(language_code, voice_name, speed):
+    """Return the serialized synthesize request body with a placeholder for the text"""
+    payload = {
+        "input": {
+            "text": _PAYLOAD_TEXT_PLACEHOLDER.decode('ascii')
+        },
+        "voice": {
+            "languageCode": language_code,
+            "name": voice_name
+        },
+        "audioConfig": {
+            "audioEncoding": "MP3",
+            "speakingRate": speed
+        }
+    }
+    return json.dumps(payload).encode('ascii')
+
+
+def _google_tts_url():
+    """Synthesize endpoint of the Google Cloud TTS REST API"""
+    return f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_API_KEY}"
+
+
+def _google_tts_body(text, language, voice, speed):
+    """Build the serialized synthesize request body"""
+    # Map simple language codes to Google's language-region format and pick the matching voice
+    language_code = _LANG_TO_REGION.get(language, language)
+    voice_name = _REGION_TO_VOICE.get(language_code.split('-')[0], voice)
+    
+    # Only the text changes between calls, so the rest of the JSON body is pre-serialized
+    return _google_tts_payload_template(language_code, voice_name, speed).replace(
+        _PAYLOAD_TEXT_PLACEHOLDER, json.dumps(text)[1:-1].encode('ascii')
+    )
+
+
+def get_google_tts_enhanced(text, language='en', voice=DEFAULT_VOICE, speed=1.0, file_path=None):
     """
     Convert text to speech using Google Cloud Text-to-Speech API
     This uses the actual Google Cloud TTS API if API key is available
-    Returns the path to the generated audio file
+    Writes to file_path (or a new unique file) and returns the path to the generated audio file
     """
     if not GOOGLE_API_KEY:
         logger.warning("Google API key not set. Falling back to gTTS.")
         return None
     
     try:
-        url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_API_KEY}"
-        
-        payload = {
-            "input": {
-                "text": text
-            },
-            "voice": {
-                "languageCode": language,
-                "name": voice
-            },
-            "audioConfig": {
-                "audioEncoding": "MP3",
-                "speakingRate": speed
-            }
-        }
-        
-        # Map simple language codes to Google's language-region format if needed
-        if len(language) == 2:
-            if language == 'en':
-                payload["voice"]["languageCode"] = "en-US"
-            elif language == 'es':
-                payload["voice"]["languageCode"] = "es-ES"
-            elif language == 'fr':
-                payload["voice"]["languageCode"] = "fr-FR"
-            elif language == 'de':
-                payload["voice"]["languageCode"] = "de-DE"
-            elif language == 'it':
-                payload["voice"]["languageCode"] = "it-IT"
-            elif language == 'ja':
-                payload["voice"]["languageCode"] = "ja-JP"
-            elif language == 'ko':
-                payload["voice"]["languageCode"] = "ko-KR"
-            elif language == 'pt':
-                payload["voice"]["languageCode"] = "pt-BR"
-            elif language == 'ru':
-                payload["voice"]["languageCode"] = "ru-RU"
-            elif language == 'zh':
-                payload["voice"]["languageCode"] = "cmn-CN"
-        
-        # Select appropriate voice based on language
-        if payload["voice"]["languageCode"].startswith("en"):
-            payload["voice"]["name"] = "en-US-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("es"):
-            payload["voice"]["name"] = "es-ES-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("fr"):
-            payload["voice"]["name"] = "fr-FR-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("de"):
-            payload["voice"]["name"] = "de-DE-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("it"):
-            payload["voice"]["name"] = "it-IT-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("ja"):
-            payload["voice"]["name"] = "ja-JP-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("ko"):
-            payload["voice"]["name"] = "ko-KR-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("pt"):
-            payload["voice"]["name"] = "pt-BR-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("ru"):
-            payload["voice"]["name"] = "ru-RU-Neural2-F"
-        elif payload["voice"]["languageCode"].startswith("cmn"):
-            payload["voice"]["name"] = "cmn-CN-Neural2-F"
-        
-        response = requests.post(url, json=payload)
+        response = _TTS_SESSION.post(
+            _google_tts_url(), data=_google_tts_body(text, language, voice, speed),
+            headers=_JSON_HEADERS, timeout=GOOGLE_TTS_TIMEOUT
+        )
         
         if response.status_code == 200:
             audio_content = response.json().get("audioContent")
             if audio_content:
-                # Create a unique filename
-                filename = f"{uuid.uuid4()}.mp3"
-                file_path = os.path.join(AUDIO_FOLDER, filename)
-                
-                # Ensure the directory exists
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                # Use the content-addressed filename unless the caller chose one
+                if not file_path:
+                    file_path = _cached_audio_path(text, language, voice)
                 
                 # Write audio content to file
-                import base64
-                with open(file_path, "wb") as audio_file:
-                    audio_file.write(base64.b64decode(audio_content))
+                _write_base64_audio(audio_content, file_path)
                 
                 return file_path
         
@@ -131,28 +384,62 @@ def get_google_tts_enhanced(text, language='en', voice='en-US-Neural2-F', speed=
         return None
 
 
-def text_to_speech_gtts(text, lang='en'):
+def iter_google_tts_enhanced(text, language='en', voice=DEFAULT_VOICE, speed=1.0,
+                             chunk_size=AUDIO_STREAM_CHUNK_SIZE):
     """
-    Convert text to speech using gTTS library (offline/free version)
-    Returns the path to the generated audio file
+    Stream MP3 bytes from the Google Cloud TTS REST API as the response arrives
+    The base64 audioContent is decoded incrementally, so the body is never fully held in memory
+    Raises on HTTP or connection errors
     """
-    try:
-        # Verify that we have text to speak
-        if not text or text.strip() == '':
-            logger.error("Empty text provided for speech conversion")
-            # Use default error message instead of failing
-            text = "Lo siento, hubo un problema al generar una respuesta de voz."
+    with _TTS_SESSION.post(
+        _google_tts_url(), data=_google_tts_body(text, language, voice, speed),
+        headers=_JSON_HEADERS, timeout=GOOGLE_TTS_TIMEOUT, stream=True
+    ) as response:
+        response.raise_for_status()
         
-        # Create a unique filename
-        filename = f"{uuid.uuid4()}.mp3"
-        file_path = os.path.join(AUDIO_FOLDER, filename)
+        pending = b""
+        in_audio = False
+        for data in response.iter_content(chunk_size):
+            pending += data
+            
+            # Skip ahead to the opening quote of the audioContent value
+            if not in_audio:
+                key = pending.find(_AUDIO_CONTENT_KEY)
+                colon = pending.find(b":", key + len(_AUDIO_CONTENT_KEY)) if key != -1 else -1
+                quote = pending.find(b'"', colon + 1) if colon != -1 else -1
+                if quote == -1:
+                    continue
+                pending = pending[quote + 1:]
+                in_audio = True
+            
+            # Decode whole 4-character groups; the closing quote ends the audio
+            end = pending.find(b'"')
+            if end != -1:
+                pending = pending[:end]
+            usable = len(pending) if end != -1 else len(pending) - len(pending) % 4
+            if usable:
+                yield binascii.a2b_base64(pending[:usable])
+                pending = pending[usable:]
+            if end != -1:
+                return
         
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        raise ValueError("Google TTS response did not contain complete audio content")
+
+
+def text_to_speech_gtts(text, lang='en', file_path=None):
+    """
+    Convert text to speech using gTTS library (offline/free version)
+    Writes to file_path (or a new unique file) and returns the path to the generated audio file
+    """
+    try:
+        # Use the content-addressed filename (reusing an earlier synthesis) unless the caller chose one
+        if not file_path:
+            file_path = _cached_audio_path(text, lang, None)
+            if os.path.exists(file_path):
+                return file_path
         
         # Generate speech using gTTS
-        tts = gTTS(text=text, lang=lang)
-        tts.save(file_path)
+        _save_gtts(text, lang, file_path)
         
         return file_path
     
@@ -160,84 +447,100 @@ def text_to_speech_gtts(text, lang='en'):
         logger.error(f"Error using gTTS: {e}")
         # Create a fallback error message audio instead of raising exception
         try:
-            error_filename = f"error_{uuid.uuid4()}.mp3"
-            error_file_path = os.path.join(AUDIO_FOLDER, error_filename)
-            os.makedirs(os.path.dirname(error_file_path), exist_ok=True)
-            
-            error_tts = gTTS(text="Lo siento, hubo un problema al convertir el texto a voz.", lang=lang)
-            error_tts.save(error_file_path)
+            error_text = "Lo siento, hubo un problema al convertir el texto a voz."
+            error_file_path = _cached_audio_path(error_text, lang, None)
+            if not os.path.exists(error_file_path):
+                _save_gtts(error_text, lang, error_file_path)
             return error_file_path
         except:
             # If even the error message fails, then we raise the original exception
             raise Exception(f"Failed to convert text to speech: {e}")
 
 
-def get_google_cloud_tts(text, language='en', voice=None):
+def _google_tts_available():
+    """Import the Google Cloud TTS library on first call and return whether it is available"""
+    global texttospeech, _GOOGLE_TTS_AVAILABLE, _GCLOUD_AUDIO_CONFIG
+    if _GOOGLE_TTS_AVAILABLE is None:
+        with _GCLOUD_TTS_CLIENT_LOCK:
+            if _GOOGLE_TTS_AVAILABLE is None:
+                try:
+                    from google.cloud import texttospeech as texttospeech_module
+                    texttospeech = texttospeech_module
+                    # Identical for every request, so it is built once
+                    _GCLOUD_AUDIO_CONFIG = texttospeech.AudioConfig(
+                        audio_encoding=texttospeech.AudioEncoding.MP3
+                    )
+                    _GOOGLE_TTS_AVAILABLE = True
+                except ImportError:
+                    _GOOGLE_TTS_AVAILABLE = False
+    return _GOOGLE_TTS_AVAILABLE
+
+
+@functools.lru_cache(maxsize=32)
+def _voice_params(language_code, name):
+    """Cached VoiceSelectionParams; only read by the client, so safe to share"""
+    return texttospeech.VoiceSelectionParams(language_code=language_code, name=name)
+
+
+def _synthesis_input(text):
+    """Reuse one SynthesisInput message per thread instead of building one per call"""
+    synthesis_input = getattr(_GCLOUD_THREAD_STATE, "synthesis_input", None)
+    if synthesis_input is None:
+        synthesis_input = texttospeech.SynthesisInput()
+        _GCLOUD_THREAD_STATE.synthesis_input = synthesis_input
+    synthesis_input.text = text
+    return synthesis_input
+
+
+def _gcloud_configured():
+    """Return True if the Google Cloud client can be used (credentials file and library present)"""
+    return os.path.exists(GOOGLE_CREDENTIALS_FILE) and _google_tts_available()
+
+
+def _get_gcloud_client():
+    """Return the shared Google Cloud TextToSpeechClient, creating it on first use"""
+    global _GCLOUD_TTS_CLIENT
+    with _GCLOUD_TTS_CLIENT_LOCK:
+        if _GCLOUD_TTS_CLIENT is None:
+            _GCLOUD_TTS_CLIENT = texttospeech.TextToSpeechClient()
+    return _GCLOUD_TTS_CLIENT
+
+
+def get_google_cloud_tts(text, language='en', voice=None, file_path=None):
     """
     Convert text to speech using Google Cloud Text-to-Speech client library
     This uses the Google Cloud credentials file
-    Returns the path to the generated audio file
+    Writes to file_path (or a new unique file) and returns the path to the generated audio file
     """
-    if not GOOGLE_TTS_AVAILABLE or not os.path.exists(GOOGLE_CREDENTIALS_FILE):
+    if not _gcloud_configured():
         logger.warning("Google Cloud credentials not found or library not available")
         return None
     
     try:
-        # Initialize the client
-        client = texttospeech.TextToSpeechClient()
+        # Get the shared client
+        client = _get_gcloud_client()
         
-        # Set the text input to be synthesized
-        synthesis_input = texttospeech.SynthesisInput(text=text)
+        # Set the text input to be synthesized (reused per thread)
+        synthesis_input = _synthesis_input(text)
         
         # Map simple language codes to Google's language-region format if needed
-        voice_language = language
-        if len(language) == 2:
-            if language == 'en':
-                voice_language = "en-US"
-            elif language == 'es':
-                voice_language = "es-ES"
-            elif language == 'fr':
-                voice_language = "fr-FR"
-            elif language == 'de':
-                voice_language = "de-DE"
-            elif language == 'it':
-                voice_language = "it-IT"
-            elif language == 'ja':
-                voice_language = "ja-JP"
-            elif language == 'ko':
-                voice_language = "ko-KR"
-            elif language == 'pt':
-                voice_language = "pt-BR"
-            elif language == 'ru':
-                voice_language = "ru-RU"
-            elif language == 'zh':
-                voice_language = "cmn-CN"
+        voice_language = _LANG_TO_REGION.get(language, language)
         
         # Select voice based on language
         voice_name = voice if voice else f"{voice_language}-Neural2-F"
         
         # Build the voice request
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=voice_language,
-            name=voice_name
-        )
-        
-        # Select the type of audio file
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
-        )
+        voice = _voice_params(voice_language, voice_name)
         
         # Perform the text-to-speech request
         response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+            input=synthesis_input, voice=voice, audio_config=_GCLOUD_AUDIO_CONFIG,
+            timeout=GCLOUD_TTS_TIMEOUT
         )
         
-        # Create a unique filename
-        filename = f"{uuid.uuid4()}.mp3"
-        file_path = os.path.join(AUDIO_FOLDER, filename)
-        
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Use the content-addressed filename unless the caller chose one
+        if not file_path:
+            file_path = _cached_audio_path(text, language, voice_name)
         
         # Write the response to the output file
         with open(file_path, "wb") as out:
@@ -251,62 +554,299 @@ def get_google_cloud_tts(text, language='en', voice=None):
         return None
 
 
-def text_to_speech(text, language='en', voice=None):
+def _hedged_synthesis(text, language, voice, cached_path, prefer=None):
     """
-    Main entry point for text-to-speech conversion
-    Tries different TTS methods in order of preference:
-    We're starting with gTTS since we're having issues with Google Cloud
-    1. gTTS (primary method for now)
-    2. Google Cloud TTS client (using credentials file)
-    3. Google Cloud TTS REST API (using API key)
-    """
-    # Check if text is empty or None
-    if not text or text.strip() == '':
-        logger.error("Empty text provided to text_to_speech")
-        text = "Lo siento, hubo un problema al generar una respuesta."
+    Start gTTS and the Google Cloud client concurrently and return the first real synthesis
+    (moved to cached_path), or None if neither succeeds within HEDGE_TIMEOUT
+    The slower backend is not waited for; its output is discarded when it finishes.
+    With prefer="google_cloud", a gTTS result is only used if the Cloud attempt fails or
+    times out; with prefer="gTTS", the Cloud client is not tried
+    """
+    attempts = {}
+    gtts_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+    logger.info(f"Converting text to speech using gTTS: {text[:50]}...")
+    attempts[_GTTS_EXECUTOR.submit(text_to_speech_gtts, text, language, gtts_path)] = ("gTTS", gtts_path)
     
-    # Start with gTTS because we're having issues with Google Cloud TTS
+    # Not configured is not a failure: skip the attempt instead of feeding the circuit breaker
+    gcloud_future = None
+    if (prefer != "gTTS" and _gcloud_configured() and _fits_google_tts(text)
+            and not _circuit_is_open("google_cloud") and _GCLOUD_IN_FLIGHT.acquire(blocking=False)):
+        gcloud_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+        gcloud_future = _GCLOUD_EXECUTOR.submit(get_google_cloud_tts, text, language, voice, gcloud_path)
+        gcloud_future.add_done_callback(lambda _: _GCLOUD_IN_FLIGHT.release())
+        attempts[gcloud_future] = ("google_cloud", gcloud_path)
+    
+    winner = None
+    held_back = None  # gTTS output kept while the preferred Cloud attempt is pending
+    timed_out = False
     try:
-        logger.info(f"Converting text to speech using gTTS: {text[:50]}...")
-        tts_file_path = text_to_speech_gtts(text, lang=language)
-        if tts_file_path:
-            return tts_file_path
-    except Exception as e:
-        logger.warning(f"Could not use gTTS: {e}")
+        for future in as_completed(attempts, timeout=HEDGE_TIMEOUT):
+            backend, tmp_path = attempts[future]
+            # Only output written to our temporary file counts (not gTTS's error message audio)
+            if _attempt_result(future, backend) != tmp_path:
+                continue
+            if prefer == "google_cloud" and backend == "gTTS" and gcloud_future is not None:
+                held_back = tmp_path
+                continue
+            winner = _store_cached_audio(tmp_path, tmp_path, cached_path)
+            break
+    except FuturesTimeoutError:
+        logger.warning(f"No preferred TTS backend finished within {HEDGE_TIMEOUT}s")
+        timed_out = True
     
-    # If gTTS fails, try Google Cloud options
-    tts_file_path = None
+    if winner is None and held_back:
+        winner = _store_cached_audio(held_back, held_back, cached_path)
+    
+    # The Google Cloud outcome feeds the circuit breaker even when the call finishes after
+    # the hedge returned; a call still running at the hedge timeout counts as a failure
+    if gcloud_future is not None:
+        if timed_out and not gcloud_future.done():
+            _record_backend_result("google_cloud", False)
+        else:
+            gcloud_path = attempts[gcloud_future][1]
+            gcloud_future.add_done_callback(lambda future: _record_backend_result(
+                "google_cloud", future.exception() is None and future.result() == gcloud_path))
+    
+    # Clean up the other attempts' output whenever they finish (the winner's file was already moved)
+    for future, (_, tmp_path) in attempts.items():
+        future.add_done_callback(lambda _, path=tmp_path: _discard_file(path))
     
-    # Try Google Cloud TTS client (credentials-based)
+    return winner
+
+
+def _attempt_result(future, backend):
+    """Path returned by a finished backend attempt, or None if it raised"""
     try:
-        tts_file_path = get_google_cloud_tts(text, language=language, voice=voice)
-        if tts_file_path:
-            return tts_file_path
+        return future.result()
     except Exception as e:
-        logger.warning(f"Could not use Google Cloud TTS client: {e}")
+        logger.warning(f"Could not use {backend}: {e}")
+        return None
+
+
+def text_to_speech(text, language='en', voice=None, prefer=None):
+    """
+    Main entry point for text-to-speech conversion
+    Tries different TTS methods in order of preference:
+    1. gTTS and the Google Cloud TTS client (using credentials file), started concurrently
+    2. Google Cloud TTS REST API (using API key)
+    prefer (see pick_speech_backend) keeps the segments of one reply on the same voice
+    """
+    # Single guard for every backend: empty text gets the static error audio
+    text = (text or "").strip()
+    if not _is_speakable(text):
+        return _error_audio_path()
+    
+    # Reuse a previous synthesis of the same text, language and voice
+    cached_path = _cached_audio_path(text, language, voice)
+    if os.path.exists(cached_path):
+        return cached_path
+    
+    # Race gTTS against the Google Cloud client and keep the first successful synthesis,
+    # so a slow or hanging backend does not add its full timeout to the response time
+    tts_file_path = _hedged_synthesis(text, language, voice, cached_path, prefer)
+    if tts_file_path:
+        return tts_file_path
+    
+    # Backends write to a unique temporary file that is moved into the cache on success
+    tmp_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+    tts_file_path = None
     
     # If that fails, try the REST API with API key
-    if GOOGLE_API_KEY:
+    if GOOGLE_API_KEY and _fits_google_tts(text) and not _circuit_is_open("google_rest"):
         try:
-            voice_to_use = voice if voice else 'en-US-Neural2-F'
-            tts_file_path = get_google_tts_enhanced(text, language=language, voice=voice_to_use)
-            if tts_file_path:
-                return tts_file_path
+            voice_to_use = voice or _default_voice(language)
+            tts_file_path = get_google_tts_enhanced(text, language=language, voice=voice_to_use, file_path=tmp_path)
         except Exception as e:
             logger.warning(f"Could not use Google TTS API: {e}")
+        _record_backend_result("google_rest", bool(tts_file_path))
+        if tts_file_path:
+            return _store_cached_audio(tts_file_path, tmp_path, cached_path)
     
-    # If we got here, all methods failed - create a static message
+    # If we got here, all methods failed - use the static message created at import
     logger.error("All TTS methods failed")
+    _discard_file(tmp_path)
     
-    # Create a static error audio file if none exists
-    error_path = os.path.join(AUDIO_FOLDER, "error_message.mp3")
-    if not os.path.exists(error_path):
+    return _error_audio_path()
+
+
+def submit_text_to_speech(text, language='en', voice=None, prefer=None):
+    """
+    Start text_to_speech in a background thread
+    Returns a Future resolving to the path of the generated audio file
+    """
+    return _TTS_EXECUTOR.submit(text_to_speech, text, language, voice, prefer)
+
+
+def pick_speech_backend():
+    """
+    Backend to prefer for every segment of one reply, so concatenated segments share a voice:
+    the Google Cloud client when it is usable, gTTS otherwise
+    """
+    if _gcloud_configured() and not _circuit_is_open("google_cloud"):
+        return "google_cloud"
+    return "gTTS"
+
+
+def concat_audio_files(file_paths):
+    """
+    Concatenate MP3 segments (in order) into a single audio file
+    Returns the path to the combined file, or None if there was nothing to combine
+    """
+    file_paths = [path for path in file_paths if path]
+    if not file_paths:
+        return None
+    if len(file_paths) == 1:
+        return file_paths[0]
+    
+    # Segments are content-addressed, so the combination of their names identifies the result
+    file_path = _cached_audio_path("|".join(os.path.basename(path) for path in file_paths), "concat", None)
+    if os.path.exists(file_path):
+        return file_path
+    
+    tmp_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+    try:
+        # MP3 frames are self-contained, so segments can be joined byte by byte
+        with open(tmp_path, "wb", buffering=AUDIO_FILE_BUFFER_SIZE) as out:
+            for segment_path in file_paths:
+                with open(segment_path, "rb") as segment:
+                    shutil.copyfileobj(segment, out, AUDIO_FILE_BUFFER_SIZE)
+        os.replace(tmp_path, file_path)
+        
+        return file_path
+    except Exception as e:
+        logger.error(f"Error concatenating audio segments: {e}")
+        _discard_file(tmp_path)
+        return file_paths[0]
+
+
+def create_speech_ticket(text, language='en', voice=None):
+    """
+    Register text for on-demand synthesis
+    Returns an opaque ticket that can be exchanged for streamed audio
+    """
+    ticket = secrets.token_urlsafe(16)
+    now = time.time()
+    with _SPEECH_TICKETS_LOCK:
+        # Drop expired tickets
+        for expired in [key for key, entry in _SPEECH_TICKETS.items() if entry[0] < now]:
+            del _SPEECH_TICKETS[expired]
+        _SPEECH_TICKETS[ticket] = (now + SPEECH_TICKET_TTL, text, language, voice)
+    return ticket
+
+
+def get_speech_ticket(ticket):
+    """Return (text, language, voice) for a valid ticket, or None if unknown/expired"""
+    with _SPEECH_TICKETS_LOCK:
+        entry = _SPEECH_TICKETS.get(ticket)
+    if not entry or entry[0] < time.time():
+        return None
+    return entry[1:]
+
+
+def iter_text_to_speech(text, language='en', voice=None, chunk_size=AUDIO_STREAM_CHUNK_SIZE):
+    """
+    Stream MP3 bytes for the given text as they are synthesized
+    The stream is also saved to the audio cache, so the same text is not synthesized again
+    Tries gTTS, then the Google TTS REST API, and falls back to text_to_speech (file-based)
+    if no streaming backend could start
+    """
+    text = (text or "").strip()
+    if not _is_speakable(text):
+        yield from _iter_audio_file(_error_audio_path(), chunk_size)
+        return
+    
+    # Previously synthesized audio is served straight from the cache
+    file_path = _cached_audio_path(text, language, voice)
+    if os.path.exists(file_path):
+        yield from _iter_audio_file(file_path, chunk_size)
+        return
+    
+    sources = [("gTTS", lambda: PooledGTTS(text=text, lang=language).stream())]
+    if GOOGLE_API_KEY and _fits_google_tts(text) and not _circuit_is_open("google_rest"):
+        sources.append(("Google TTS API", lambda: iter_google_tts_enhanced(
+            text, language=language, voice=voice or _default_voice(language), chunk_size=chunk_size)))
+    
+    for name, source in sources:
+        started = False
         try:
-            os.makedirs(os.path.dirname(error_path), exist_ok=True)
-            error_tts = gTTS(text="Lo siento, hubo un problema con la síntesis de voz.", lang="es")
-            error_tts.save(error_path)
-        except:
-            # If even this fails, we'll return None and let the caller handle it
-            return None
+            for audio_chunk in _tee_to_file(source(), file_path):
+                started = True
+                yield audio_chunk
+            return
+        except Exception as e:
+            if started:
+                logger.error(f"{name} stream interrupted: {e}")
+                return
+            logger.warning(f"Could not stream with {name}: {e}")
     
-    return error_path
\ No newline at end of file
+    file_path = text_to_speech(text, language=language, voice=voice)
+    if file_path:
+        yield from _iter_audio_file(file_path, chunk_size)
+
+
+def _tee_to_file(audio_chunks, file_path):
+    """
+    Pass audio chunks through while writing them to file_path
+    The file only appears once the stream completed; partial output is discarded
+    """
+    tmp_path = os.path.join(AUDIO_FOLDER, _new_audio_filename('tmp_'))
+    completed = False
+    try:
+        with open(tmp_path, "wb", buffering=AUDIO_FILE_BUFFER_SIZE) as out:
+            for audio_chunk in audio_chunks:
+                out.write(audio_chunk)
+                yield audio_chunk
+        completed = True
+        os.replace(tmp_path, file_path)
+    finally:
+        if not completed:
+            _discard_file(tmp_path)
+
+
+def _iter_audio_file(file_path, chunk_size=AUDIO_STREAM_CHUNK_SIZE):
+    """Yield the contents of an audio file in chunks"""
+    with open(file_path, "rb") as audio_file:
+        while True:
+            audio_chunk = audio_file.read(chunk_size)
+            if not audio_chunk:
+                break
+            yield audio_chunk
+
+
+def _ensure_error_audio():
+    """Create the static error message audio if it does not exist yet (errors are only logged)"""
+    if os.path.exists(_ERROR_PATH):
+        return
+    try:
+        _save_gtts(ERROR_MESSAGE_TEXT, "es", _ERROR_PATH, timeout=5)
+    except Exception as e:
+        logger.warning(f"Could not create the static error audio: {e}")
+
+
+def _error_audio_path():
+    """
+    Path of the audio returned on failure: the spoken error message, or the shipped tone
+    while the message does not exist yet (creating it is then retried in the background)
+    """
+    global _error_audio_retry_at
+    if os.path.exists(_ERROR_PATH):
+        return _ERROR_PATH
+    
+    with _error_audio_retry_lock:
+        retry = time.time() >= _error_audio_retry_at
+        if retry:
+            _error_audio_retry_at = time.time() + ERROR_AUDIO_RETRY_SECONDS
+    if retry:
+        _TTS_EXECUTOR.submit(_ensure_error_audio)
+    return _ERROR_FALLBACK_PATH
+
+
+def _install_error_fallback():
+    """Copy the shipped tone into the audio folder so it is served like any other clip"""
+    if not os.path.exists(_ERROR_FALLBACK_PATH):
+        shutil.copyfile(_ERROR_FALLBACK_SOURCE, _ERROR_FALLBACK_PATH)
+
+
+# Prepared up front so the failure path never needs the network
+_install_error_fallback()
+_ensure_error_audio()
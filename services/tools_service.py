@@ -4,54 +4,103 @@ Service functions for OpenAI tools (file search, vector store, etc.)
 import os
 import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# File to store vector store ID
-VECTOR_STORE_FILE = 'vector_store_id.json'
+# File to store vector store ID (single location, configurable with DATA_DIR)
+VECTOR_STORE_FILE = os.path.join(os.environ.get('DATA_DIR', '.'), 'vector_store_id.json')
+
+# In-memory copy of the stored vector store ID (the file is only read once)
+_CACHED_VS_ID = None
+_CACHED_VS_LOADED = False
+_VS_ID_LOCK = threading.Lock()
+
+# Parallel requests when listing batches/files of a vector store, and when uploading files
+VECTOR_STORE_MAX_WORKERS = 16
+UPLOAD_MAX_WORKERS = 8
+
+# File metadata does not change once a file is processed, so it is kept in memory
+# (least recently used entries are evicted past FILE_INFO_CACHE_SIZE)
+FILE_INFO_CACHE_SIZE = 1024
+_FILE_INFO_CACHE = OrderedDict()
+_FILE_INFO_CACHE_LOCK = threading.Lock()
 
 
 def get_stored_vector_store_id():
-    """Retrieve stored vector store ID from file if exists"""
-    try:
-        if os.path.exists(VECTOR_STORE_FILE):
-            with open(VECTOR_STORE_FILE, 'r') as f:
-                data = json.load(f)
-                return data.get('vector_store_id')
-    except Exception as e:
-        logger.error(f"Error retrieving vector store ID: {e}")
+    """Retrieve stored vector store ID (read from file once, then kept in memory)"""
+    global _CACHED_VS_ID, _CACHED_VS_LOADED
+    if _CACHED_VS_LOADED:
+        return _CACHED_VS_ID
+    
+    with _VS_ID_LOCK:
+        if _CACHED_VS_LOADED:
+            return _CACHED_VS_ID
+        try:
+            if os.path.exists(VECTOR_STORE_FILE):
+                with open(VECTOR_STORE_FILE, 'r') as f:
+                    data = json.load(f)
+                    _CACHED_VS_ID = data.get('vector_store_id')
+            _CACHED_VS_LOADED = True
+        except Exception as e:
+            # Not marked as loaded, so the next call reads the file again
+            logger.error(f"Error retrieving vector store ID: {e}")
     
-    return None
+    return _CACHED_VS_ID
 
 
 def save_vector_store_id(vector_store_id):
     """Save vector store ID to file for persistence"""
-    try:
-        with open(VECTOR_STORE_FILE, 'w') as f:
-            json.dump({'vector_store_id': vector_store_id}, f)
-    except Exception as e:
-        logger.error(f"Error saving vector store ID: {e}")
+    global _CACHED_VS_ID, _CACHED_VS_LOADED
+    with _VS_ID_LOCK:
+        _CACHED_VS_ID = vector_store_id
+        _CACHED_VS_LOADED = True
+        try:
+            with open(VECTOR_STORE_FILE, 'w') as f:
+                json.dump({'vector_store_id': vector_store_id}, f)
+        except Exception as e:
+            logger.error(f"Error saving vector store ID: {e}")
 
 
-def upload_file_to_vector_store(client, file_path):
+def _upload_file(client, file_path):
+    """Upload a single file to OpenAI Files and return its ID"""
+    with open(file_path, 'rb') as file:
+        file_obj = client.files.create(
+            file=file,
+            purpose="assistants"
+        )
+    return file_obj.id
+
+
+def upload_files_to_vector_store(client, file_paths):
     """
-    Upload a file to OpenAI's vector store for file search
-    Returns: (file_id, vector_store_id)
+    Upload several files concurrently and add them to the vector store in a single batch
+    Returns: (file_ids, vector_store_id)
     """
+    if not file_paths:
+        raise ValueError("No files to upload")
+    
+    file_ids = []
+    batched = False
     try:
         # First, check if we already have a vector store ID
         vector_store_id = get_stored_vector_store_id()
         
-        # Upload file to OpenAI Files
-        with open(file_path, 'rb') as file:
-            file_obj = client.files.create(
-                file=file,
-                purpose="assistants"
-            )
-        
-        file_id = file_obj.id
+        # Upload files to OpenAI Files in parallel, keeping the IDs of the uploads that succeed
+        errors = []
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+            futures = [executor.submit(_upload_file, client, file_path) for file_path in file_paths]
+            for future in futures:
+                try:
+                    file_ids.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
         
         # If we don't have a vector store ID, create a new one
         if not vector_store_id:
@@ -63,11 +112,12 @@ def upload_file_to_vector_store(client, file_path):
             vector_store_id = vector_store.id
             save_vector_store_id(vector_store_id)
         
-        # Add the file to the vector store
+        # Add all the files to the vector store at once
         file_vector = client.beta.vector_stores.file_batches.create(
             vector_store_id=vector_store_id,
-            file_ids=[file_id]
+            file_ids=file_ids
         )
+        batched = True
         
         # Check file batch status
         batch_id = file_vector.id
@@ -78,29 +128,86 @@ def upload_file_to_vector_store(client, file_path):
         
         logger.info(f"File batch status: {batch_status.status}")
         
-        return file_id, vector_store_id
+        return file_ids, vector_store_id
     except Exception as e:
-        logger.error(f"Error uploading file to vector store: {e}")
-        raise Exception(f"Failed to upload file: {e}")
+        logger.error(f"Error uploading files to vector store: {e}")
+        # Do not leave orphaned files behind when they never made it into the vector store
+        if not batched:
+            _delete_files(client, file_ids)
+        raise Exception(f"Failed to upload files: {e}")
+
+
+def _delete_files(client, file_ids):
+    """Delete uploaded files from OpenAI Files, logging (not raising) individual failures"""
+    for file_id in file_ids:
+        try:
+            client.files.delete(file_id)
+        except Exception as e:
+            logger.warning(f"Could not delete uploaded file {file_id}: {e}")
+
+
+def upload_file_to_vector_store(client, file_path):
+    """
+    Upload a file to OpenAI's vector store for file search
+    Returns: (file_id, vector_store_id)
+    """
+    file_ids, vector_store_id = upload_files_to_vector_store(client, [file_path])
+    return file_ids[0], vector_store_id
+
+
+def _retrieve_batches(client, vector_store_id):
+    """Retrieve the details of every file batch in the vector store concurrently"""
+    file_batches = client.beta.vector_stores.file_batches.list(
+        vector_store_id=vector_store_id
+    )
+    
+    def retrieve(batch):
+        return client.beta.vector_stores.file_batches.retrieve(
+            vector_store_id=vector_store_id,
+            file_batch_id=batch.id
+        )
+    
+    with ThreadPoolExecutor(max_workers=VECTOR_STORE_MAX_WORKERS) as executor:
+        return list(executor.map(retrieve, file_batches.data))
+
+
+def _get_file_info(client, file_id):
+    """Return the details of a file as a dict (None on error)"""
+    with _FILE_INFO_CACHE_LOCK:
+        cached = _FILE_INFO_CACHE.get(file_id)
+        if cached:
+            _FILE_INFO_CACHE.move_to_end(file_id)
+            return cached
+    
+    try:
+        file_info = client.files.retrieve(file_id)
+    except Exception as file_error:
+        logger.error(f"Error retrieving file {file_id}: {file_error}")
+        return None
+    
+    info = {
+        'id': file_info.id,
+        'filename': file_info.filename,
+        'created_at': file_info.created_at,
+        'bytes': file_info.bytes,
+        'status': file_info.status
+    }
+    if file_info.status == "processed":
+        with _FILE_INFO_CACHE_LOCK:
+            _FILE_INFO_CACHE[file_id] = info
+            if len(_FILE_INFO_CACHE) > FILE_INFO_CACHE_SIZE:
+                _FILE_INFO_CACHE.popitem(last=False)
+    return info
 
 
 def get_file_status_in_vector_store(client, vector_store_id, file_id):
     """Get the status of a file in the vector store"""
     try:
-        file_batches = client.beta.vector_stores.file_batches.list(
-            vector_store_id=vector_store_id
-        )
-        
         # Check all batches for the file
-        for batch in file_batches.data:
-            batch_info = client.beta.vector_stores.file_batches.retrieve(
-                vector_store_id=vector_store_id,
-                file_batch_id=batch.id
-            )
-            
+        for batch_info in _retrieve_batches(client, vector_store_id):
             if file_id in batch_info.file_ids:
                 return {
-                    'batch_id': batch.id,
+                    'batch_id': batch_info.id,
                     'status': batch_info.status
                 }
         
@@ -122,35 +229,15 @@ def get_available_files(client, vector_store_id=None):
     
     try:
         # Get all file batches from the vector store
-        file_batches = client.beta.vector_stores.file_batches.list(
-            vector_store_id=vector_store_id
-        )
-        
         file_ids = []
-        for batch in file_batches.data:
-            batch_info = client.beta.vector_stores.file_batches.retrieve(
-                vector_store_id=vector_store_id,
-                file_batch_id=batch.id
-            )
-            
+        for batch_info in _retrieve_batches(client, vector_store_id):
             # Only include completed files
             if batch_info.status == "completed":
                 file_ids.extend(batch_info.file_ids)
         
         # Get file details
-        files = []
-        for file_id in file_ids:
-            try:
-                file_info = client.files.retrieve(file_id)
-                files.append({
-                    'id': file_info.id,
-                    'filename': file_info.filename,
-                    'created_at': file_info.created_at,
-                    'bytes': file_info.bytes,
-                    'status': file_info.status
-                })
-            except Exception as file_error:
-                logger.error(f"Error retrieving file {file_id}: {file_error}")
+        with ThreadPoolExecutor(max_workers=VECTOR_STORE_MAX_WORKERS) as executor:
+            files = [info for info in executor.map(lambda file_id: _get_file_info(client, file_id), file_ids) if info]
         
         return files
     except Exception as e:
@@ -164,26 +251,19 @@ def delete_file_from_vector_store(client, vector_store_id, file_id):
     """
     try:
         # First, remove the file from all batches in the vector store
-        file_batches = client.beta.vector_stores.file_batches.list(
-            vector_store_id=vector_store_id
-        )
-        
-        for batch in file_batches.data:
-            batch_info = client.beta.vector_stores.file_batches.retrieve(
-                vector_store_id=vector_store_id,
-                file_batch_id=batch.id
-            )
-            
+        for batch_info in _retrieve_batches(client, vector_store_id):
             if file_id in batch_info.file_ids:
                 # Remove file from batch
                 client.beta.vector_stores.file_batches.delete(
                     vector_store_id=vector_store_id,
-                    file_batch_id=batch.id,
+                    file_batch_id=batch_info.id,
                     file_ids=[file_id]
                 )
         
         # Now delete the file from OpenAI
         client.files.delete(file_id)
+        with _FILE_INFO_CACHE_LOCK:
+            _FILE_INFO_CACHE.pop(file_id, None)
         
         return True
     except Exception as e:
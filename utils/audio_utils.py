@@ -1,16 +1,30 @@
 """
 Utility functions for audio processing
 """
+import io
 import os
-import uuid
+import shutil
 import logging
+import tempfile
+import threading
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Audio folder path
 AUDIO_FOLDER = os.path.join('uploads', 'audio')
+_dir_ready = False
+_dir_ready_lock = threading.Lock()
+
+# Buffer size for uploads that are only held in memory
+AUDIO_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Upload names are reachable under /audio/, so they must stay unguessable;
+# random bytes are drawn from the OS in bulk instead of once per upload
+FILENAME_TOKEN_BYTES = 16
+_RANDOM_POOL_SIZE = 256 * FILENAME_TOKEN_BYTES
+_random_pool = b''
+_random_pool_pos = 0
+_random_pool_lock = threading.Lock()
 
 
 def save_audio_file(audio_file):
@@ -18,17 +32,145 @@ def save_audio_file(audio_file):
     Save audio file to temporary location and return path
     """
     try:
-        # Ensure the directory exists
-        os.makedirs(AUDIO_FOLDER, exist_ok=True)
+        # Ensure the directory exists (checked once per process)
+        _ensure_audio_folder()
         
         # Generate a unique filename
-        filename = f"{uuid.uuid4()}.webm"
+        filename = f"{_filename_token()}.webm"
         filepath = os.path.join(AUDIO_FOLDER, filename)
         
         # Save the file
-        audio_file.save(filepath)
+        _write_upload(audio_file.stream, filepath, getattr(audio_file, 'content_length', None))
         
         return filepath
     except Exception as e:
-        logger.error(f"Error saving audio file: {e}")
-        raise Exception(f"Failed to save audio file: {e}")
\ No newline at end of file
+        logger.error("Error saving audio file: %s", e)
+        raise Exception(f"Failed to save audio file: {e}")
+
+
+def save_audio_file_pipe(audio_file):
+    """
+    Stream an upload through a pipe instead of writing it to disk
+    Returns the read end file descriptor, for consumers that read sequentially
+    (e.g. ffmpeg -i /dev/fd/N with pass_fds=(N,)); the caller must close it
+    """
+    try:
+        read_fd, write_fd = os.pipe()
+        threading.Thread(
+            target=_pump_upload, args=(audio_file.stream, write_fd), daemon=True
+        ).start()
+        return read_fd
+    except Exception as e:
+        logger.error("Error piping audio file: %s", e)
+        raise Exception(f"Failed to pipe audio file: {e}")
+
+
+def _pump_upload(stream, write_fd):
+    """Copy the upload into the pipe; closing the write end signals EOF to the reader"""
+    try:
+        with os.fdopen(write_fd, 'wb') as out:
+            shutil.copyfileobj(stream, out, AUDIO_COPY_BUFFER_SIZE)
+    except BrokenPipeError:
+        logger.warning("Audio pipe reader closed before the upload was fully read")
+    except Exception as e:
+        logger.error("Error piping audio file: %s", e)
+
+
+def _ensure_audio_folder():
+    """Create the audio folder on first use instead of issuing mkdir on every upload"""
+    global _dir_ready
+    if _dir_ready:
+        return
+    with _dir_ready_lock:
+        if not _dir_ready:
+            os.makedirs(AUDIO_FOLDER, exist_ok=True)
+            _dir_ready = True
+
+
+def _filename_token():
+    """Random hex token for a filename, sliced from a pooled os.urandom read"""
+    global _random_pool, _random_pool_pos
+    with _random_pool_lock:
+        if _random_pool_pos + FILENAME_TOKEN_BYTES > len(_random_pool):
+            _random_pool = os.urandom(_RANDOM_POOL_SIZE)
+            _random_pool_pos = 0
+        token = _random_pool[_random_pool_pos:_random_pool_pos + FILENAME_TOKEN_BYTES]
+        _random_pool_pos += FILENAME_TOKEN_BYTES
+    return token.hex()
+
+
+def _write_upload(stream, filepath, size_hint=None):
+    """Copy an upload stream to filepath, inside the kernel when it is backed by a file"""
+    src_fd = _upload_fd(stream)
+    with open(filepath, 'wb') as out:
+        if src_fd is not None:
+            # Copy from the logical stream position, past anything still buffered
+            stream.flush()
+            offset = stream.tell()
+            size = os.fstat(src_fd).st_size - offset
+            _preallocate(out.fileno(), size)
+            _copy_fd(src_fd, out.fileno(), offset, size)
+            return
+        
+        buffer = _upload_buffer(stream)
+        if buffer is not None:
+            # Hand the whole in-memory upload to a single write, without copying it
+            with buffer.getbuffer() as view:
+                _preallocate(out.fileno(), len(view) - buffer.tell())
+                out.write(view[buffer.tell():])
+            return
+        
+        _preallocate(out.fileno(), size_hint)
+        shutil.copyfileobj(stream, out, AUDIO_COPY_BUFFER_SIZE)
+        # The hint may overstate the upload; drop any preallocated tail
+        out.truncate()
+
+
+def _preallocate(fd, size):
+    """Reserve the file's blocks up front so the filesystem can allocate contiguous extents"""
+    if not size or not hasattr(os, 'posix_fallocate'):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError:
+        # Not every filesystem supports preallocation
+        pass
+
+
+def _upload_fd(stream):
+    """File descriptor backing an upload stream, or None if it is held in memory"""
+    # fileno() would force an in-memory spooled upload onto disk
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        if not stream._rolled:
+            return None
+        stream = stream._file
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _upload_buffer(stream):
+    """BytesIO holding an in-memory upload, or None for other stream types"""
+    if isinstance(stream, tempfile.SpooledTemporaryFile) and not stream._rolled:
+        stream = stream._file
+    return stream if isinstance(stream, io.BytesIO) else None
+
+
+def _copy_fd(src_fd, dst_fd, offset, count):
+    """Copy count bytes from src_fd at offset to dst_fd without user-space buffers"""
+    use_copy_file_range = hasattr(os, 'copy_file_range')
+    while count > 0:
+        if use_copy_file_range:
+            try:
+                sent = os.copy_file_range(src_fd, dst_fd, count, offset)
+            except OSError:
+                # Unsupported across these filesystems; sendfile copies the rest
+                use_copy_file_range = False
+                continue
+        else:
+            sent = os.sendfile(dst_fd, src_fd, offset, count)
+        if not sent:
+            break
+        offset += sent
+        count -= sent
@@ -0,0 +1,192 @@
+"""
+Persistent worker processes that probe media durations with PyAV
+
+Paths are sent one per line on a worker's stdin, and it answers each with
+"path<TAB>duration" (or "path<TAB>!error") on stdout. Libav is loaded once for
+the life of a worker rather than once per probe, and a crash or stall on a
+malformed upload only takes down that worker, which is replaced on demand.
+"""
+import os
+import sys
+import time
+import atexit
+import logging
+import selectors
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# Workers run probes in parallel, one probe per worker at a time
+DAEMON_POOL_SIZE = os.cpu_count() or 4
+# Seconds a worker may take to load PyAV, and to answer a single probe
+WORKER_START_TIMEOUT = 10
+PROBE_TIMEOUT = 10
+# Seconds to wait for a worker to exit at shutdown
+DAEMON_STOP_TIMEOUT = 2
+# Seconds to skip the workers (and use ffprobe) after one could not start
+WORKER_RETRY_DELAY = 60
+
+_READY_LINE = b"ready\n"
+
+_idle_workers = []
+_all_workers = set()
+_workers_lock = threading.Lock()
+_worker_slots = threading.BoundedSemaphore(DAEMON_POOL_SIZE)
+_workers_broken_until = 0.0
+
+
+class ProbeWorkerUnavailable(RuntimeError):
+    """Raised when no worker can be started (e.g. a broken PyAV install)"""
+
+
+def probe_duration(video_path, timeout=PROBE_TIMEOUT):
+    """
+    Get the duration of a media file from a worker process
+    Returns the duration in seconds; raises RuntimeError if it cannot be probed
+    (ProbeWorkerUnavailable if workers cannot run at all)
+    """
+    if '\n' in video_path:
+        raise ValueError("Path contains a newline")
+    if time.monotonic() < _workers_broken_until:
+        raise ProbeWorkerUnavailable("Probe workers are unavailable")
+
+    with _worker_slots:
+        worker = _checkout_worker()
+        try:
+            worker.stdin.write(os.fsencode(video_path) + b'\n')
+            worker.stdin.flush()
+            line = _read_line(worker, timeout)
+        except (OSError, TimeoutError) as e:
+            # A stalled or dead worker is replaced for the next call
+            _stop_worker(worker, kill=True)
+            raise RuntimeError(f"Probe worker failed on {video_path}: {str(e) or 'timed out'}")
+        _checkin_worker(worker)
+
+    path, _, result = os.fsdecode(line.rstrip(b'\n')).rpartition('\t')
+    if path != video_path:
+        raise RuntimeError(f"Probe worker answered for the wrong file: {path}")
+    if result.startswith('!'):
+        raise RuntimeError(result[1:])
+    return float(result)
+
+
+def _checkout_worker():
+    """Take an idle live worker, or start a new one"""
+    with _workers_lock:
+        while _idle_workers:
+            worker = _idle_workers.pop()
+            if worker.poll() is None:
+                return worker
+            _all_workers.discard(worker)
+    return _start_worker()
+
+
+def _checkin_worker(worker):
+    """Return a worker to the idle pool"""
+    with _workers_lock:
+        _idle_workers.append(worker)
+
+
+def _start_worker():
+    """Spawn a worker running this module's _serve loop and wait until PyAV is loaded"""
+    logger.info("Starting media probe worker")
+    try:
+        worker = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            close_fds=False
+        )
+    except OSError as e:
+        _mark_workers_broken()
+        raise ProbeWorkerUnavailable(f"Probe worker could not start: {e}")
+    with _workers_lock:
+        _all_workers.add(worker)
+    try:
+        ready = _read_line(worker, WORKER_START_TIMEOUT)
+    except (OSError, TimeoutError):
+        ready = b""
+    if ready != _READY_LINE:
+        _stop_worker(worker, kill=True)
+        _mark_workers_broken()
+        raise ProbeWorkerUnavailable("Probe worker could not start")
+    return worker
+
+
+def _mark_workers_broken():
+    """Send probes to ffprobe for WORKER_RETRY_DELAY seconds, then try starting workers again"""
+    global _workers_broken_until
+    _workers_broken_until = time.monotonic() + WORKER_RETRY_DELAY
+    logger.warning(f"Media probe worker could not start; falling back to ffprobe for {WORKER_RETRY_DELAY}s")
+
+
+def _read_line(worker, timeout):
+    """Read one line from the worker's stdout; raises TimeoutError past the deadline"""
+    fd = worker.stdout.fileno()
+    deadline = time.monotonic() + timeout
+    data = b""
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while not data.endswith(b'\n'):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not selector.select(remaining):
+                raise TimeoutError()
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise OSError("Probe worker exited")
+            data += chunk
+    return data
+
+
+def _stop_worker(worker, kill=False):
+    """Close the worker's stdin so it exits, killing it if it does not (or right away)"""
+    with _workers_lock:
+        _all_workers.discard(worker)
+    try:
+        if kill:
+            worker.kill()
+        worker.stdin.close()
+        worker.wait(timeout=DAEMON_STOP_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        worker.kill()
+        worker.wait()
+    worker.stdout.close()
+
+
+def _stop_all_workers():
+    """Shut down every worker at exit"""
+    with _workers_lock:
+        workers = list(_all_workers)
+        _idle_workers.clear()
+    for worker in workers:
+        _stop_worker(worker)
+
+
+atexit.register(_stop_all_workers)
+
+
+def _serve():
+    """Worker loop: answer one probe per line read from stdin"""
+    import av
+
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    stdout.write(_READY_LINE)
+    stdout.flush()
+
+    for line in stdin:
+        path = os.fsdecode(line.rstrip(b'\n'))
+        try:
+            with av.open(path) as container:
+                if container.duration is None:
+                    raise ValueError(f"No duration in container: {path}")
+                result = repr(float(container.duration) / av.time_base)
+        except Exception as e:
+            result = '!' + ' '.join(str(e).split())
+        stdout.write(os.fsencode(f"{path}\t{result}\n"))
+        stdout.flush()
+
+
+if __name__ == '__main__':
+    _serve()
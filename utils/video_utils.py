@@ -2,41 +2,376 @@
 Utility functions for video processing
 """
 import os
+import json
+import math
+import asyncio
+import shutil
+import struct
 import logging
+import threading
 import subprocess
+import importlib.util
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.ffprobe_daemon import ProbeWorkerUnavailable, probe_duration as probe_duration_daemon
+
+# PyAV probes run in a persistent worker process (only the worker imports it); ffprobe is the fallback
+PYAV_AVAILABLE = importlib.util.find_spec('av') is not None
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Probed durations are cached per (path, mtime, size), so a rewritten file is probed again
+DURATION_CACHE_SIZE = 4096
+_DURATION_CACHE = OrderedDict()
+_DURATION_CACHE_LOCK = threading.Lock()
+
+# Concurrent probes for batch lookups, bounded by the number of CPUs
+PROBE_MAX_WORKERS = os.cpu_count() or 4
+
+# ffprobe resolved once at import, so exec skips the PATH search on every probe
+_FFPROBE = shutil.which('ffprobe') or 'ffprobe'
+if not PYAV_AVAILABLE and not os.path.isabs(_FFPROBE):
+    logger.warning("Neither PyAV nor ffprobe found; only MP4/WebM headers can be probed")
+
+# ffprobe command line that prints only the container duration
+_FFPROBE_DURATION_ARGS = (_FFPROBE, '-v', 'error', '-show_entries', 'format=duration',
+                          '-of', 'default=noprint_wrappers=1:nokey=1')
+
+# Container headers parsed directly, without PyAV or ffprobe
+_MP4_TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'}
+_EBML_MAGIC = b'\x1a\x45\xdf\xa3'
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_CLUSTER = 0x1F43B675
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+WEBM_HEADER_READ_SIZE = 64 * 1024
+
 
 def get_video_duration(video_path):
     """
-    Get the duration of a video file using ffprobe/ffmpeg
+    Get the duration of a video file using PyAV, or ffprobe if PyAV is not installed
     Returns the duration in seconds or None if an error occurs
     """
     try:
-        if not os.path.exists(video_path):
-            logger.error(f"Video file not found: {video_path}")
+        try:
+            st = os.stat(video_path)
+        except FileNotFoundError:
+            logger.error("Video file not found: %s", video_path)
             return None
         
+        return _probe_duration(video_path, st.st_mtime_ns, st.st_size)
+    
+    except Exception as e:
+        logger.error("Error processing video: %s", e)
+        return None
+
+
+async def get_video_duration_async(video_path):
+    """
+    Async variant of get_video_duration: ffprobe runs without blocking the event loop
+    Returns the duration in seconds or None if an error occurs
+    """
+    try:
+        try:
+            st = os.stat(video_path)
+        except FileNotFoundError:
+            logger.error("Video file not found: %s", video_path)
+            return None
+        
+        cache_key = (video_path, st.st_mtime_ns, st.st_size)
+        duration = _cached_duration(cache_key)
+        if duration is not None:
+            return duration
+        
+        # The worker round-trip blocks, so hand the whole probe (header and sidecar included) to a thread
+        if PYAV_AVAILABLE:
+            return await asyncio.to_thread(_probe_duration, video_path, st.st_mtime_ns, st.st_size)
+        
+        duration = _read_local_duration(video_path, st.st_mtime_ns)
+        if duration is not None:
+            _store_duration(cache_key, duration)
+            return duration
+        
         # Run ffprobe to get duration
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', 
-             '-of', 'default=noprint_wrappers=1:nokey=1', video_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+        proc = await asyncio.create_subprocess_exec(
+            *_FFPROBE_DURATION_ARGS, video_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            close_fds=False
         )
+        stdout, _ = await proc.communicate()
         
-        if result.returncode != 0:
-            logger.error(f"Error getting video duration: {result.stderr}")
+        if proc.returncode != 0:
+            logger.error("Error getting video duration: ffprobe exited with %s", proc.returncode)
             return None
         
-        # Parse the duration as a float
-        duration = float(result.stdout.strip())
+        duration = float(stdout)
+        _write_sidecar(video_path, duration)
+        _store_duration(cache_key, duration)
         return duration
     
     except Exception as e:
-        logger.error(f"Error processing video: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error processing video: %s", e)
+        return None
+
+
+async def get_video_durations_async(video_paths):
+    """
+    Async variant of get_video_durations: probes overlap on the event loop
+    Returns a list of durations in seconds (None for files that fail), in input order
+    """
+    semaphore = asyncio.Semaphore(2 * PROBE_MAX_WORKERS)
+    
+    async def probe(video_path):
+        async with semaphore:
+            return await get_video_duration_async(video_path)
+    
+    return await asyncio.gather(*(probe(path) for path in video_paths))
+
+
+def get_video_durations(video_paths):
+    """
+    Get the durations of several video files, probing them concurrently
+    Returns a list of durations in seconds (None for files that fail), in input order
+    """
+    video_paths = list(video_paths)
+    if len(video_paths) <= 1:
+        return [get_video_duration(path) for path in video_paths]
+    
+    with ThreadPoolExecutor(max_workers=min(PROBE_MAX_WORKERS, len(video_paths))) as executor:
+        return list(executor.map(get_video_duration, video_paths))
+
+
+def _probe_duration(video_path, mtime_ns, size):
+    """Probe one version of a file (cached); failures raise so they are not cached"""
+    cache_key = (video_path, mtime_ns, size)
+    duration = _cached_duration(cache_key)
+    if duration is not None:
+        return duration
+    
+    duration = _read_local_duration(video_path, mtime_ns)
+    if duration is None:
+        if PYAV_AVAILABLE:
+            try:
+                duration = probe_duration_daemon(video_path)
+            except ProbeWorkerUnavailable:
+                pass  # PyAV is installed but unusable; ffprobe takes over
+        if duration is None:
+            duration = _run_ffprobe(video_path)
+        _write_sidecar(video_path, duration)
+    
+    _store_duration(cache_key, duration)
+    return duration
+
+
+def _cached_duration(cache_key):
+    """Duration cached for (path, mtime_ns, size), or None"""
+    with _DURATION_CACHE_LOCK:
+        duration = _DURATION_CACHE.get(cache_key)
+        if duration is not None:
+            _DURATION_CACHE.move_to_end(cache_key)
+        return duration
+
+
+def _store_duration(cache_key, duration):
+    """Cache a probed duration, evicting the least recently used entry past DURATION_CACHE_SIZE"""
+    with _DURATION_CACHE_LOCK:
+        _DURATION_CACHE[cache_key] = duration
+        if len(_DURATION_CACHE) > DURATION_CACHE_SIZE:
+            _DURATION_CACHE.popitem(last=False)
+
+
+def _read_local_duration(video_path, mtime_ns):
+    """Duration from the container header or a fresh sidecar, without running a probe (None if neither has it)"""
+    duration = _read_header_duration(video_path)
+    if duration is None:
+        duration = _read_sidecar_duration(video_path, mtime_ns)
+    return duration
+
+
+def _run_ffprobe(video_path):
+    """Run ffprobe to get duration"""
+    result = subprocess.run(
+        (*_FFPROBE_DURATION_ARGS, video_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        # Descriptors are non-inheritable by default, so skip the close-all-fds walk
+        close_fds=False
+    )
+    
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe exited with {result.returncode}")
+    
+    # float() parses the short ASCII bytes directly
+    return float(result.stdout)
+
+
+def _sidecar_paths(video_path):
+    """Sidecar files that may hold ffprobe-style JSON for video_path, in lookup order"""
+    return (video_path + '.json', os.path.splitext(video_path)[0] + '.ffprobe.json')
+
+
+def _read_sidecar_duration(video_path, mtime_ns):
+    """Duration from a JSON sidecar at least as new as the video; None if there is none"""
+    for sidecar_path in _sidecar_paths(video_path):
+        try:
+            if os.stat(sidecar_path).st_mtime_ns < mtime_ns:
+                continue
+            with open(sidecar_path, 'rb') as f:
+                return float(json.load(f)['format']['duration'])
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug("Ignoring sidecar %s: %s", sidecar_path, e)
+    return None
+
+
+def _write_sidecar(video_path, duration):
+    """Store the probed duration next to the video so later processes skip the probe"""
+    sidecar_path = _sidecar_paths(video_path)[0]
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'format': {'duration': f"{duration:.6f}"}}, f)
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        logger.debug("Could not write sidecar %s: %s", sidecar_path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _read_header_duration(video_path):
+    """Read the duration from MP4/MOV or WebM/Matroska headers; None if that is not possible"""
+    try:
+        with open(video_path, 'rb') as fp:
+            head = fp.read(8)
+            fp.seek(0)
+            if head[:4] == _EBML_MAGIC:
+                return _parse_webm_duration(fp)
+            if head[4:8] in _MP4_TOP_LEVEL_BOXES:
+                return _parse_mp4_duration(fp)
+    except (OSError, ValueError, IndexError, TypeError, struct.error) as e:
+        logger.debug("Could not parse container header of %s: %s", video_path, e)
+    return None
+
+
+def _iter_mp4_boxes(fp, end):
+    """Yield (type, payload offset, end offset) for the boxes from the current position to end"""
+    pos = fp.tell()
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', fp.read(8))
+        payload = pos + 8
+        if size == 1:
+            # 64-bit size follows the type
+            size = struct.unpack('>Q', fp.read(8))[0]
+            payload += 8
+        elif size == 0:
+            # Box extends to the end of its parent
+            size = end - pos
+        if pos + size < payload or pos + size > end:
+            raise ValueError(f"Invalid size for box {box_type!r}")
+        yield box_type, payload, pos + size
+        pos += size
+        fp.seek(pos)
+
+
+def _parse_mp4_duration(fp):
+    """Read timescale and duration from moov/mvhd, seeking past everything else"""
+    file_end = os.fstat(fp.fileno()).st_size
+    for box_type, payload, box_end in _iter_mp4_boxes(fp, file_end):
+        if box_type != b'moov':
+            continue
+        fp.seek(payload)
+        for child_type, child_payload, _ in _iter_mp4_boxes(fp, box_end):
+            if child_type != b'mvhd':
+                continue
+            fp.seek(child_payload)
+            version = fp.read(4)[0]  # Version byte followed by 3 flag bytes
+            if version == 1:
+                _, _, timescale, duration = struct.unpack('>QQIQ', fp.read(28))
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                _, _, timescale, duration = struct.unpack('>IIII', fp.read(16))
+                unknown = 0xFFFFFFFF
+            # Fragmented files leave the duration at 0 or all ones
+            if not timescale or not duration or duration == unknown:
+                return None
+            return duration / timescale
+        return None
+    return None
+
+
+def _read_ebml_vint(buf, pos, keep_marker=False):
+    """Decode an EBML variable-length integer; returns (value, next position)"""
+    first = buf[pos]
+    if not first:
+        raise ValueError("Invalid EBML varint")
+    length = 9 - first.bit_length()
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    for byte in buf[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if pos + length > len(buf):
+        raise ValueError("Truncated EBML varint")
+    return value, pos + length
+
+
+def _read_ebml_element(buf, pos):
+    """Return (element id, data position, data size or None when the size is unknown)"""
+    element_id, pos = _read_ebml_vint(buf, pos, keep_marker=True)
+    size_pos = pos
+    size, pos = _read_ebml_vint(buf, pos)
+    if size == (1 << (7 * (pos - size_pos))) - 1:
+        size = None
+    return element_id, pos, size
+
+
+def _parse_webm_duration(fp):
+    """Read Segment/Info/Duration, scaled by TimecodeScale, from the start of the file"""
+    buf = fp.read(WEBM_HEADER_READ_SIZE)
+    
+    # Skip the EBML header, then enter the Segment
+    _, pos, size = _read_ebml_element(buf, 0)
+    if size is None:
+        return None
+    element_id, pos, _ = _read_ebml_element(buf, pos + size)
+    if element_id != _EBML_SEGMENT:
+        return None
+    
+    while pos < len(buf):
+        element_id, data_pos, size = _read_ebml_element(buf, pos)
+        if element_id == _EBML_CLUSTER or size is None:
+            return None
+        if element_id == _EBML_INFO:
+            if data_pos + size > len(buf):
+                return None
+            return _parse_webm_info(buf[data_pos:data_pos + size])
+        pos = data_pos + size
+    return None
+
+
+def _parse_webm_info(info):
+    """Return the duration in seconds from the payload of an Info element"""
+    timecode_scale = 1000000  # Matroska default, in nanoseconds
+    duration = None
+    pos = 0
+    while pos < len(info):
+        element_id, data_pos, size = _read_ebml_element(info, pos)
+        if size is None:
+            return None
+        data = info[data_pos:data_pos + size]
+        if element_id == _EBML_TIMECODE_SCALE:
+            timecode_scale = int.from_bytes(data, 'big')
+        elif element_id == _EBML_DURATION:
+            duration = struct.unpack('>f' if size == 4 else '>d', data)[0]
+        pos = data_pos + size
+    if duration is None or not timecode_scale:
+        return None
+    # Corrupted files can carry NaN, infinite or negative values
+    seconds = duration * timecode_scale / 1e9
+    if not math.isfinite(seconds) or seconds <= 0:
+        return None
+    return seconds